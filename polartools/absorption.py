@@ -6,6 +6,7 @@ Functions to load and process x-ray absorption data.
    ~load_dichro
    ~load_lockin
    ~load_multi_xas
+   ~load_multi_xas_stream
    ~load_multi_dichro
    ~load_multi_lockin
    ~normalize_absorption
@@ -23,7 +24,7 @@ Functions to load and process x-ray absorption data.
 
 from .load_data import load_table, is_Bluesky_specfile
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.interpolate import PchipInterpolator
 from spec2nexus.spec import (
     SpecDataFile, SpecDataFileNotFound, NotASpecDataFile
 )
@@ -31,38 +32,71 @@ from ._larch import finde0, index_nearest
 from xraydb import xray_line, xray_edge, material_mu
 from lmfit.models import PolynomialModel
 from warnings import warn
+from functools import lru_cache
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import matplotlib.pyplot as plt
 
-_spec_default_cols = dict(
+# Defaults are shared between calls, so they are kept read-only.
+_spec_default_cols = MappingProxyType(dict(
     positioner='Energy',
     detector='IC5',
     monitor='IC4',
     dc_col='Lock DC',
     ac_col='Lock AC',
     acoff_col='Lock ACoff',
-    )
+    ))
 
-_bluesky_default_cols = dict(
+_bluesky_default_cols = MappingProxyType(dict(
     positioner='energy',
     detector='Ion Ch 5',
     monitor='Ion Ch 4',
     dc_col='Lock DC',
     ac_col='Lock AC',
     acoff_col='Lock AC off',
-    )
+    ))
+
+# Each dichro point has 4 readings (+, -, -, +). First row averages them into
+# the xanes, second row takes the (+) - (-) difference for the xmcd.
+_dichro_weights = np.array([
+    [0.25, 0.25, 0.25, 0.25],
+    [0.5, -0.5, -0.5, 0.5],
+    ])
+_dichro_weights.setflags(write=False)
+
+# Energy scans are normally monotonic. Setting this to True skips the check
+# (and sorting) of the energy of each scan before it is interpolated in the
+# load_multi_* functions. Only use it if all scans are in increasing energy.
+_assume_sorted = False
+
+
+@lru_cache(maxsize=32)
+def _is_bluesky_spec_file(spec_file, folder=""):
+    """
+    Internal function to cache `is_Bluesky_specfile` for each file.
+
+    Exceptions are not cached, so a file that is missing or not yet a valid
+    spec file is checked again on the next call.
+    """
+    return is_Bluesky_specfile(spec_file, folder=folder)
 
 
 def _select_default_names(source, **kwargs):
     # Select default parameters
-    if isinstance(source, (str, SpecDataFile)):
-        # It is csv or spec.
+    if isinstance(source, str):
+        # It is csv or spec. Reading the file header is slow, so the result
+        # is cached for each file.
         try:
             # Checks spec origin.
-            check = is_Bluesky_specfile(source, **kwargs)
+            check = _is_bluesky_spec_file(source, kwargs.get('folder', ""))
             _defaults = _bluesky_default_cols if check else _spec_default_cols
         except (NotASpecDataFile, SpecDataFileNotFound):
             # If not a spec file, it must be csv, and use bluesky defaults.
             _defaults = _bluesky_default_cols
+    elif isinstance(source, SpecDataFile):
+        check = is_Bluesky_specfile(source)
+        _defaults = _bluesky_default_cols if check else _spec_default_cols
     else:
         # It is databroker.
         _defaults = _bluesky_default_cols
@@ -116,28 +150,31 @@ def load_absorption(scan, source, positioner=None, detector=None, monitor=None,
     :func:`polartools.load_data.load_table`
     """
 
-    _defaults = _select_default_names(source, **kwargs)
+    if not all((positioner, detector, monitor)):
+        _defaults = _select_default_names(source, **kwargs)
 
-    if not positioner:
-        positioner = _defaults['positioner']
-    if not detector:
-        detector = _defaults['detector']
-    if not monitor:
-        monitor = _defaults['monitor']
+        if not positioner:
+            positioner = _defaults['positioner']
+        if not detector:
+            detector = _defaults['detector']
+        if not monitor:
+            monitor = _defaults['monitor']
 
     # Load data
     table = load_table(scan, source, **kwargs)
 
+    x = table[positioner].to_numpy()
+    mon = table[monitor].to_numpy()
+    det = table[detector].to_numpy()
+
+    # Operate in place to avoid temporary arrays.
     if transmission:
-        return (
-            table[positioner].values,
-            np.log(table[monitor]/table[detector]).values
-            )
+        y = mon/det
+        np.log(y, out=y)
     else:
-        return (
-            table[positioner].values,
-            (table[detector]/table[monitor]).values
-            )
+        y = det/mon
+
+    return x, y
 
 
 def load_lockin(scan, source, positioner=None, dc_col=None, ac_col=None,
@@ -189,22 +226,27 @@ def load_lockin(scan, source, positioner=None, dc_col=None, ac_col=None,
     :func:`polartools.load_data.load_table`
     """
 
-    _defaults = _select_default_names(source, **kwargs)
+    if not all((positioner, dc_col, ac_col, acoff_col)):
+        _defaults = _select_default_names(source, **kwargs)
 
-    if not positioner:
-        positioner = _defaults['positioner']
-    if not dc_col:
-        dc_col = _defaults['dc_col']
-    if not ac_col:
-        ac_col = _defaults['ac_col']
-    if not acoff_col:
-        acoff_col = _defaults['acoff_col']
+        if not positioner:
+            positioner = _defaults['positioner']
+        if not dc_col:
+            dc_col = _defaults['dc_col']
+        if not ac_col:
+            ac_col = _defaults['ac_col']
+        if not acoff_col:
+            acoff_col = _defaults['acoff_col']
 
     # Load data
     table = load_table(scan, source, **kwargs)
 
-    return (table[positioner].values, table[dc_col].values,
-            (table[ac_col] - table[acoff_col]).values)
+    x = table[positioner].to_numpy()
+    dc = table[dc_col].to_numpy()
+    ac = table[ac_col].to_numpy()
+    acoff = table[acoff_col].to_numpy()
+
+    return x, dc, ac - acoff
 
 
 def load_dichro(scan, source, positioner=None, detector=None, monitor=None,
@@ -259,8 +301,7 @@ def load_dichro(scan, source, positioner=None, detector=None, monitor=None,
     """
 
     # In SPEC the columns are different.
-    if (isinstance(source, (str, SpecDataFile)) and source != 'csv' and not
-            is_Bluesky_specfile(source, **kwargs)):
+    if _select_default_names(source, **kwargs) is _spec_default_cols:
 
         if not positioner:
             positioner = _spec_default_cols['positioner']
@@ -270,36 +311,183 @@ def load_dichro(scan, source, positioner=None, detector=None, monitor=None,
             detector = _spec_default_cols['detector']
 
         table = load_table(scan, source, **kwargs)
-        x = table[positioner].values
-        monp = table[monitor+'(+)'].values
-        detp = table[detector+'(+)'].values
-        monm = table[monitor+'(-)'].values
-        detm = table[detector+'(-)'].values
+        x = table[positioner].to_numpy()
+        monp = table[monitor+'(+)'].to_numpy()
+        detp = table[detector+'(+)'].to_numpy()
+        monm = table[monitor+'(-)'].to_numpy()
+        detm = table[detector+'(-)'].to_numpy()
 
+        # Operate in place to avoid temporary arrays.
         if transmission:
-            xanes = (np.log(monp/detp) + np.log(monm/detm))/2.
-            xmcd = np.log(monp/detp) - np.log(monm/detm)
+            plus = monp/detp
+            minus = monm/detm
+            np.log(plus, out=plus)
+            np.log(minus, out=minus)
         else:
-            xanes = (detp/monp + detm/monm)/2.
-            xmcd = detp/monp - detm/monm
+            plus = detp/monp
+            minus = detm/monm
+
+        xanes = plus + minus
+        xanes /= 2.
+        xmcd = np.subtract(plus, minus, out=plus)
 
     else:
         x0, y0 = load_absorption(scan, source, positioner, detector, monitor,
                                  transmission, **kwargs)
-        size = x0.size//4
+        if x0.size % 4 != 0:
+            raise ValueError(
+                "Dichro scans must have 4 points per energy, but scan "
+                f"{scan} has {x0.size} points."
+            )
 
-        x0 = x0.reshape(size, 4)
-        y0 = y0.reshape(size, 4)
+        x0 = np.ascontiguousarray(x0, dtype=np.float64)
+        y0 = np.ascontiguousarray(y0, dtype=np.float64)
+        size = x0.size//4
 
-        x = x0.mean(axis=1)
-        xanes = y0.mean(axis=1)
-        xmcd = y0[:, [0, 3]].mean(axis=1) - y0[:, [1, 2]].mean(axis=1)
+        x = x0.reshape(size, 4) @ _dichro_weights[0]
+        # (2, size) result, so its rows are contiguous and independent.
+        xanes, xmcd = _dichro_weights @ y0.reshape(size, 4).T
 
     return x, xanes, xmcd
 
 
+def _load_scans(load_func, scans, source, *args, max_workers=None,
+                **kwargs):
+    """
+    Internal function to load multiple scans using a pool of threads.
+
+    Loading csv files or databroker runs is dominated by file/database access,
+    so the scans are read concurrently. The spec file parser is not thread
+    safe, so spec files are always read serially. The results are returned in
+    the same order as `scans`.
+    """
+    if len(scans) == 0:
+        raise ValueError("At least one scan must be provided.")
+
+    if isinstance(source, SpecDataFile) or (isinstance(source, str) and
+                                            source != 'csv'):
+        max_workers = 1
+    elif max_workers is None:
+        max_workers = min(16, len(scans))
+
+    if max_workers == 1:
+        return [load_func(scan, source, *args, **kwargs) for scan in scans]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(load_func, scan, source, *args, **kwargs)
+                   for scan in scans]
+        return [future.result() for future in futures]
+
+
+def _check_kind(kind):
+    """ Internal function to check the interpolation kind."""
+    if kind not in ('linear', 'pchip'):
+        raise ValueError(
+            "The parameter 'kind' must be either 'linear' or 'pchip', "
+            f"but {kind} was entered."
+        )
+
+
+def _interp_scan(energy, energy_tmp, ys, kind='linear'):
+    """
+    Internal function to interpolate the data of one scan onto `energy`.
+
+    Returns an array with one row per element of `ys`. Points outside the
+    energy range of the scan are set to NaN.
+    """
+    ys = np.array(ys, dtype=float)
+    if energy_tmp is energy:
+        # Reference scan, nothing to interpolate.
+        return ys
+    if not _assume_sorted and np.any(np.diff(energy_tmp) < 0):
+        order = np.argsort(energy_tmp)
+        energy_tmp = energy_tmp[order]
+        ys = ys[:, order]
+
+    if kind == 'pchip':
+        # PchipInterpolator needs strictly increasing energies, so points
+        # with repeated energies are replaced by their average.
+        if np.any(np.diff(energy_tmp) == 0):
+            energy_tmp, inverse, counts = np.unique(
+                energy_tmp, return_inverse=True, return_counts=True
+                )
+            ys = np.array([
+                np.bincount(inverse, weights=y)/counts for y in ys
+                ])
+        return PchipInterpolator(
+            energy_tmp, ys, axis=1, extrapolate=False
+            )(energy)
+
+    # Linear interpolation. The brackets and weights are shared by all ys.
+    index = np.searchsorted(energy_tmp, energy, side='right') - 1
+    index = np.clip(index, 0, energy_tmp.size-2)
+    x0 = energy_tmp[index]
+    dx = energy_tmp[index+1] - x0
+    t = np.divide(energy - x0, dx, out=np.zeros(energy.shape), where=dx != 0)
+
+    left, right = ys[:, index], ys[:, index+1]
+    with np.errstate(invalid='ignore'):
+        output = left*(1-t) + right*t
+    # Points on a knot take only that sample, so a NaN or inf in the other
+    # bracket point (times a zero weight) does not leak into them.
+    output[:, t == 0] = left[:, t == 0]
+    output[:, t == 1] = right[:, t == 1]
+    output[:, (energy < energy_tmp[0]) | (energy > energy_tmp[-1])] = np.nan
+    return output
+
+
+def _interp_scans(energy, data, kind='linear'):
+    """
+    Internal function to interpolate multiple scans onto `energy`.
+
+    `data` is a sequence of (energy, y1, y2, ...) tuples, one per scan.
+    Returns an array with shape (number of y, number of scans, len(energy)).
+    """
+    output = np.empty((len(data[0])-1, len(data), energy.size))
+    for i, (energy_tmp, *ys) in enumerate(data):
+        output[:, i] = _interp_scan(energy, energy_tmp, ys, kind=kind)
+    return output
+
+
+def _interp_accumulate(energy, data, kind='linear'):
+    """
+    Internal function to average multiple scans interpolated onto `energy`.
+
+    `data` is an iterable of (energy, y1, y2, ...) tuples, one per scan. The
+    scans are folded into a running mean and variance one at a time (Welford's
+    algorithm), so the array with all interpolated scans is never built, and
+    `data` can be a generator. Points outside the energy range of a scan are
+    ignored.
+
+    Returns the mean and the error of the mean, both with shape
+    (number of y, len(energy)).
+    """
+    counts = None
+    for energy_tmp, *ys in data:
+        ys = _interp_scan(energy, energy_tmp, ys, kind=kind)
+        valid = ~np.isnan(ys)
+        if counts is None:
+            counts = np.zeros(ys.shape, dtype=int)
+            mean = np.zeros(ys.shape)
+            m2 = np.zeros(ys.shape)
+        counts += valid
+        delta = np.where(valid, ys - mean, 0.)
+        mean += np.divide(delta, counts, out=np.zeros(ys.shape), where=valid)
+        m2 += delta*np.where(valid, ys - mean, 0.)
+
+    n = np.maximum(counts, 1)
+    std = np.sqrt(m2/n)/np.sqrt(n)
+
+    empty = counts == 0
+    mean[empty] = np.nan
+    std[empty] = np.nan
+
+    return mean, std
+
+
 def load_multi_xas(scans, source, return_mean=True, positioner=None,
-                   detector=None, monitor=None, transmission=True, **kwargs):
+                   detector=None, monitor=None, transmission=True,
+                   kind='linear', max_workers=None, **kwargs):
     """
     Load multiple x-ray absorption energy scans.
 
@@ -325,6 +513,15 @@ def load_multi_xas(scans, source, return_mean=True, positioner=None,
     transmission: bool, optional
         Flag to select between transmission mode -> ln(monitor/detector)
         or fluorescence mode -> detector/monitor
+    kind : 'linear' or 'pchip', optional
+        Interpolation used to bring all scans onto the energy grid of the
+        first scan. 'pchip' uses `scipy.interpolate.PchipInterpolator`, and
+        points of a scan with repeated energies are averaged before it is
+        interpolated. Defaults to 'linear'.
+    max_workers : int, optional
+        Number of threads used to load csv or databroker scans in parallel. If
+        None, it defaults to min(16, len(scans)). Spec files are always read
+        serially.
     kwargs :
         The necessary kwargs are passed to the loading functions defined by the
         `source` argument:
@@ -346,43 +543,139 @@ def load_multi_xas(scans, source, return_mean=True, positioner=None,
         xanes.shape = (len(energy))
     xanes_std : numpy.array, optional
         Error of the mean of x-ray absorption. This will only be returned if
-        return_mean = True.
+        return_mean = True. Energy points outside the range of a given scan
+        are ignored when averaging.
 
     See also
     --------
     :func:`polartools.load_data.load_absorption`
     """
 
-    for scan in scans:
-        if 'energy' not in locals():
-            energy, xanes = load_absorption(
-                scan, source, positioner, detector, monitor, transmission,
-                **kwargs
-                )
-        else:
-            energy_tmp, xanes_tmp = load_absorption(
-                scan, source, positioner, detector, monitor, transmission,
-                **kwargs
-                )
-            xanes = np.vstack((xanes, interp1d(energy_tmp, xanes_tmp,
-                                               kind='linear',
-                                               fill_value=np.nan,
-                                               bounds_error=False)(energy)))
+    _check_kind(kind)
+
+    _defaults = _select_default_names(source, **kwargs)
+
+    if not positioner:
+        positioner = _defaults['positioner']
+    if not detector:
+        detector = _defaults['detector']
+    if not monitor:
+        monitor = _defaults['monitor']
+
+    scans = list(scans)
+    data = _load_scans(
+        load_absorption, scans, source, positioner, detector, monitor,
+        transmission, max_workers=max_workers, **kwargs
+        )
+
+    energy = data[0][0]
 
     if return_mean:
-        if len(xanes.shape) == 2:
-            xanes_std = xanes.std(axis=0)/np.sqrt(len(scans))
-            xanes = xanes.mean(axis=0)
-            return energy, xanes, xanes_std
-        else:
-            return energy, xanes, np.zeros((xanes.size))
-    else:
-        return energy, xanes
+        (xanes,), (xanes_std,) = _interp_accumulate(energy, data, kind=kind)
+        return energy, xanes, xanes_std
+
+    xanes, = _interp_scans(energy, data, kind=kind)
+    if len(scans) == 1:
+        xanes = xanes[0]
+
+    return energy, xanes
+
+
+def load_multi_xas_stream(scans, source, positioner=None, detector=None,
+                          monitor=None, transmission=True, kind='linear',
+                          **kwargs):
+    """
+    Average multiple x-ray absorption energy scans, loading one at a time.
+
+    Same as `load_multi_xas` with return_mean = True, but each scan is loaded,
+    interpolated and added to a running mean and variance before the next one
+    is read. The memory used is therefore independent of the number of scans,
+    which is useful to average a large number of them.
+
+    Parameters
+    ----------
+    scans : iterable
+        Sequence of scan_ids our uids. If scan_id is passed, it will load the
+        last scan with that scan_id. Use kwargs for search options. It can be
+        a generator.
+    source : databroker database, name of the spec file, or 'csv'
+        Note that applicable kwargs depend on this selection.
+    positioner : string, optional
+        Name of the positioner, this needs to be the same as defined in
+        Bluesky or SPEC. If None is passed, it defauts to the x-ray energy.
+    detector : string, optional
+        Detector to be read from this scan, again it needs to be the same name
+        as in Bluesky. If None is passed, it defaults to the ion chamber 5.
+    monitor : string, optional
+        Name of the monitor detector. If None is passed, it defaults to the ion
+        chamber 4.
+    transmission: bool, optional
+        Flag to select between transmission mode -> ln(monitor/detector)
+        or fluorescence mode -> detector/monitor
+    kind : 'linear' or 'pchip', optional
+        Interpolation used to bring all scans onto the energy grid of the
+        first scan. 'pchip' uses `scipy.interpolate.PchipInterpolator`, and
+        points of a scan with repeated energies are averaged before it is
+        interpolated. Defaults to 'linear'.
+    kwargs :
+        The necessary kwargs are passed to the loading functions defined by the
+        `source` argument:
+
+        - csv -> possible kwargs: folder, name_format.
+        - spec -> possible kwargs: folder.
+        - databroker -> possible kwargs: stream, query, use_db_v1.
+
+        Note that a warning will be printed if the an unnecessary kwarg is
+        passed.
+
+    Returns
+    -------
+    energy : numpy.array
+        X-ray energy.
+    xanes : numpy.array
+        Average x-ray absorption.
+    xanes_std : numpy.array
+        Error of the mean of x-ray absorption. Energy points outside the range
+        of a given scan are ignored when averaging.
+
+    See also
+    --------
+    :func:`polartools.absorption.load_multi_xas`
+    """
+
+    _check_kind(kind)
+
+    _defaults = _select_default_names(source, **kwargs)
+
+    if not positioner:
+        positioner = _defaults['positioner']
+    if not detector:
+        detector = _defaults['detector']
+    if not monitor:
+        monitor = _defaults['monitor']
+
+    scans = iter(scans)
+    scan = next(scans, None)
+    if scan is None:
+        raise ValueError("At least one scan must be provided.")
+
+    first = load_absorption(
+        scan, source, positioner, detector, monitor, transmission, **kwargs
+        )
+    data = chain([first], (
+        load_absorption(scan, source, positioner, detector, monitor,
+                        transmission, **kwargs)
+        for scan in scans
+        ))
+
+    energy = first[0]
+    (xanes,), (xanes_std,) = _interp_accumulate(energy, data, kind=kind)
+    return energy, xanes, xanes_std
 
 
 def load_multi_dichro(scans, source, return_mean=True, positioner=None,
                       detector=None, monitor=None, transmission=True,
-                      **kwargs):
+                      kind='linear', max_workers=None, **kwargs):
     """
     Load multiple x-ray magnetic dichroism energy "dichro" scans.
 
@@ -408,6 +701,15 @@ def load_multi_dichro(scans, source, return_mean=True, positioner=None,
     transmission: bool, optional
         Flag to select between transmission mode -> ln(monitor/detector)
         or fluorescence mode -> detector/monitor
+    kind : 'linear' or 'pchip', optional
+        Interpolation used to bring all scans onto the energy grid of the
+        first scan. 'pchip' uses `scipy.interpolate.PchipInterpolator`, and
+        points of a scan with repeated energies are averaged before it is
+        interpolated. Defaults to 'linear'.
+    max_workers : int, optional
+        Number of threads used to load csv or databroker scans in parallel. If
+        None, it defaults to min(16, len(scans)). Spec files are always read
+        serially.
     kwargs :
         The necessary kwargs are passed to the loading functions defined by the
         `source` argument:
@@ -431,7 +733,8 @@ def load_multi_dichro(scans, source, return_mean=True, positioner=None,
         X-ray magnetic dichroism. It has the same shape as the xanes.
     xanes_std : numpy.array, optional
         Error of the mean of x-ray absorption. This will only be returned if
-        return_mean = True.
+        return_mean = True. Energy points outside the range of a given scan
+        are ignored when averaging.
     xmcd_std : numpy.array, optional
         Error of the mean of x-ray magnetic dichroism. This will only be
         returned if return_mean = True.
@@ -441,42 +744,41 @@ def load_multi_dichro(scans, source, return_mean=True, positioner=None,
     :func:`polartools.load_data.load_dichro`
     """
 
-    for scan in scans:
-        if 'energy' not in locals():
-            energy, xanes, xmcd = load_dichro(
-                scan, source, positioner, detector, monitor, transmission,
-                **kwargs
-                )
-        else:
-            energy_tmp, xanes_tmp, xmcd_tmp = load_dichro(
-                scan, source, positioner, detector, monitor, transmission,
-                **kwargs
-                )
-            xanes = np.vstack((xanes, interp1d(energy_tmp, xanes_tmp,
-                                               kind='linear',
-                                               fill_value=np.nan,
-                                               bounds_error=False)(energy)))
-            xmcd = np.vstack((xmcd, interp1d(energy_tmp, xmcd_tmp,
-                                             kind='linear',
-                                             fill_value=np.nan,
-                                             bounds_error=False)(energy)))
+    _check_kind(kind)
+
+    _defaults = _select_default_names(source, **kwargs)
+
+    if not positioner:
+        positioner = _defaults['positioner']
+    if not detector:
+        detector = _defaults['detector']
+    if not monitor:
+        monitor = _defaults['monitor']
+
+    scans = list(scans)
+    data = _load_scans(
+        load_dichro, scans, source, positioner, detector, monitor,
+        transmission, max_workers=max_workers, **kwargs
+        )
+
+    energy = data[0][0]
 
     if return_mean:
-        if len(xanes.shape) == 2:
-            xanes_std = xanes.std(axis=0)/np.sqrt(len(scans))
-            xanes = xanes.mean(axis=0)
-            xmcd_std = xmcd.std(axis=0)/np.sqrt(len(scans))
-            xmcd = xmcd.mean(axis=0)
-            return energy, xanes, xmcd, xanes_std, xmcd_std
-        else:
-            return (energy, xanes, xmcd, np.zeros((xanes.size)),
-                    np.zeros((xanes.size)))
-    else:
-        return energy, xanes, xmcd
+        (xanes, xmcd), (xanes_std, xmcd_std) = _interp_accumulate(
+            energy, data, kind=kind
+            )
+        return energy, xanes, xmcd, xanes_std, xmcd_std
+
+    xanes, xmcd = _interp_scans(energy, data, kind=kind)
+    if len(scans) == 1:
+        xanes, xmcd = xanes[0], xmcd[0]
+
+    return energy, xanes, xmcd
 
 
 def load_multi_lockin(scans, source, return_mean=True, positioner=None,
-                      dc_col=None, ac_col=None, acoff_col=None, **kwargs):
+                      dc_col=None, ac_col=None, acoff_col=None,
+                      kind='linear', max_workers=None, **kwargs):
     """
     Load multiple x-ray magnetic dichroism energy "lockin" scans.
 
@@ -501,6 +803,15 @@ def load_multi_lockin(scans, source, return_mean=True, positioner=None,
     acoff_col : string, optional
         Name of the AC offset scaler. If None is passed, it defaults to
         'Lock AC off'.
+    kind : 'linear' or 'pchip', optional
+        Interpolation used to bring all scans onto the energy grid of the
+        first scan. 'pchip' uses `scipy.interpolate.PchipInterpolator`, and
+        points of a scan with repeated energies are averaged before it is
+        interpolated. Defaults to 'linear'.
+    max_workers : int, optional
+        Number of threads used to load csv or databroker scans in parallel. If
+        None, it defaults to min(16, len(scans)). Spec files are always read
+        serially.
     kwargs :
         The necessary kwargs are passed to the loading functions defined by the
         `source` argument:
@@ -524,7 +835,8 @@ def load_multi_lockin(scans, source, return_mean=True, positioner=None,
         X-ray magnetic dichroism. It has the same shape as the xanes.
     xanes_std : numpy.array, optional
         Error of the mean of x-ray absorption. This will only be returned if
-        return_mean = True.
+        return_mean = True. Energy points outside the range of a given scan
+        are ignored when averaging.
     xmcd_std : numpy.array, optional
         Error of the mean of x-ray magnetic dichroism. This will only be
         returned if return_mean = True.
@@ -534,36 +846,38 @@ def load_multi_lockin(scans, source, return_mean=True, positioner=None,
     :func:`polartools.load_data.load_lockin`
     """
 
-    for scan in scans:
-        if 'energy' not in locals():
-            energy, xanes, xmcd = load_lockin(
-                scan, source, positioner, dc_col, ac_col, acoff_col, **kwargs
-                )
-        else:
-            energy_tmp, xanes_tmp, xmcd_tmp = load_lockin(
-                scan, source, positioner, dc_col, ac_col, acoff_col, **kwargs
-                )
-            xanes = np.vstack((xanes, interp1d(energy_tmp, xanes_tmp,
-                                               kind='linear',
-                                               fill_value=np.nan,
-                                               bounds_error=False)(energy)))
-            xmcd = np.vstack((xmcd, interp1d(energy_tmp, xmcd_tmp,
-                                             kind='linear',
-                                             fill_value=np.nan,
-                                             bounds_error=False)(energy)))
+    _check_kind(kind)
+
+    _defaults = _select_default_names(source, **kwargs)
+
+    if not positioner:
+        positioner = _defaults['positioner']
+    if not dc_col:
+        dc_col = _defaults['dc_col']
+    if not ac_col:
+        ac_col = _defaults['ac_col']
+    if not acoff_col:
+        acoff_col = _defaults['acoff_col']
+
+    scans = list(scans)
+    data = _load_scans(
+        load_lockin, scans, source, positioner, dc_col, ac_col, acoff_col,
+        max_workers=max_workers, **kwargs
+        )
+
+    energy = data[0][0]
 
     if return_mean:
-        if len(xanes.shape) == 2:
-            xanes_std = xanes.std(axis=0)/np.sqrt(len(scans))
-            xanes = xanes.mean(axis=0)
-            xmcd_std = xmcd.std(axis=0)/np.sqrt(len(scans))
-            xmcd = xmcd.mean(axis=0)
-            return energy, xanes, xmcd, xanes_std, xmcd_std
-        else:
-            return (energy, xanes, xmcd, np.zeros((xanes.size)),
-                    np.zeros((xanes.size)))
-    else:
-        return energy, xanes, xmcd
+        (xanes, xmcd), (xanes_std, xmcd_std) = _interp_accumulate(
+            energy, data, kind=kind
+            )
+        return energy, xanes, xmcd, xanes_std, xmcd_std
+
+    xanes, xmcd = _interp_scans(energy, data, kind=kind)
+    if len(scans) == 1:
+        xanes, xmcd = xanes[0], xmcd[0]
+
+    return energy, xanes, xmcd
 
 
 def normalize_absorption(energy, mu, *, e0=None, edge_step=None,
@@ -655,8 +969,9 @@ def normalize_absorption(energy, mu, *, e0=None, edge_step=None,
     # Start output dictionary
     results = {}
     sort = np.argsort(energy)
-    results['energy'] = np.array(energy)[sort]
-    results['mu'] = np.array(mu)[sort]
+    # Fancy indexing already returns a copy, so the inputs are not modified.
+    results['energy'] = np.asarray(energy)[sort]
+    results['mu'] = np.asarray(mu)[sort]
 
     # Process pre-edge
     pre1, pre2 = (None, None) if not pre_range else tuple(pre_range)
@@ -758,10 +1073,8 @@ def pre_edge_background(energy, mu, e0=None, pre1=None, pre2=None, pre_order=1,
     mu_fit = mu[index]*energy[index]**nvict
     energy_fit = energy[index]
 
-    fit = _fit_polynomial(energy_fit, mu_fit, pre_order, pars=pre_pars)
-
-    precoefs = fit.best_values
-    preedge = fit.eval(x=energy)*energy**(-nvict)
+    precoefs = _fit_polynomial(energy_fit, mu_fit, pre_order, pars=pre_pars)
+    preedge = _eval_polynomial(energy, precoefs)*energy**(-nvict)
 
     return dict(energy=energy, mu=mu, preedge=preedge, pre1=pre1, pre2=pre2,
                 pre_order=pre_order, nvict=nvict, e0=e0, precoefs=precoefs,
@@ -848,10 +1161,9 @@ def post_edge_background(energy, mu, preedge=None, e0=None, edge_step=None,
     energy_fit = energy[index]
     mu_fit = (mu-preedge)[index]
 
-    fit = _fit_polynomial(energy_fit, mu_fit, post_order, pars=post_pars)
-
-    postcoefs = fit.best_values
-    postedge = preedge + fit.eval(x=energy)
+    postcoefs = _fit_polynomial(energy_fit, mu_fit, post_order,
+                                pars=post_pars)
+    postedge = preedge + _eval_polynomial(energy, postcoefs)
 
     if not edge_step:
         ie0 = index_nearest(energy, e0)
@@ -936,8 +1248,9 @@ def post_edge_flatten(energy, norm, bkg_results=None, e0=None, flat1=None,
     flat_order = bkg_results['post_order']
     flatcoefs = bkg_results['postcoefs']
 
-    flat = norm - (flat_function - flat_function[ie0])
-    flat[:ie0] = norm[:ie0]
+    # Only the region above the edge is flattened.
+    flat = np.array(norm, dtype=float)
+    flat[ie0:] -= flat_function[ie0:] - flat_function[ie0]
 
     return dict(energy=energy, norm=norm, flat=flat, flat1=flat1, flat2=flat2,
                 flat_order=flat_order, flatcoefs=flatcoefs,
@@ -996,11 +1309,24 @@ def _process_postedge_params(energy, e0, post1, post2, post_order):
 
 
 def _fit_polynomial(x, y, order, pars=None):
-    """ Internal function to fit a polynomial using `lmfit`."""
-    model = PolynomialModel(order)
+    """
+    Internal function to fit a polynomial.
+
+    Uses a linear least squares solution, unless initial parameters are given,
+    in which case `lmfit` is used. Returns the coefficients as a dictionary
+    labelled 'c0', 'c1', ...
+    """
     if not pars:
-        pars = model.guess(y, x=x)
-    return model.fit(y, pars, x=x)
+        coefs = np.polynomial.polynomial.polyfit(x, y, order)
+        return {'c{}'.format(i): float(c) for i, c in enumerate(coefs)}
+    model = PolynomialModel(order)
+    return model.fit(y, pars, x=x).best_values
+
+
+def _eval_polynomial(x, coefs):
+    """ Internal function to evaluate the output of `_fit_polynomial`."""
+    coefs = [coefs['c{}'.format(i)] for i in range(len(coefs))]
+    return np.polynomial.polynomial.polyval(x, coefs)
 
 
 def fluo_corr(norm, formula, elem, edge, line, anginp, angout):
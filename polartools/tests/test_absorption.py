@@ -3,7 +3,13 @@
 
 from polartools import absorption
 from numpy import allclose
+import numpy as np
 from os.path import join
+from shutil import copyfile
+from time import sleep
+from lmfit.models import PolynomialModel
+from pytest import raises
+from scipy.interpolate import PchipInterpolator
 
 
 def test_load_multi_xas():
@@ -169,3 +175,234 @@ def test_save_xmcd():
         normalization_parameters=normalization_parameters
     )
     absorption.save_xmcd(plus, minus, "xmcd_save_test.dat")
+
+
+def test_normalization_pars():
+    path = join('polartools', 'tests', 'data_for_test')
+    scans = [28, 29, 30, 31, 32]
+    energy, xas, _ = absorption.load_multi_xas(
+        scans, 'absorption.dat', detector='IC5', monitor='IC4', folder=path
+        )
+    result = absorption.normalize_absorption(
+        energy*1000., xas, pre_range=[-30, -20],
+        post_range=[25, None]
+        )
+
+    pre_pars = PolynomialModel(1).make_params(c0=0, c1=0)
+    result_pars = absorption.normalize_absorption(
+        energy*1000., xas, pre_range=[-30, -20],
+        post_range=[25, None], pre_pars=pre_pars
+        )
+
+    assert allclose(result_pars['preedge'], result['preedge'])
+    assert allclose(result_pars['flat'], result['flat'])
+
+
+def test_load_multi_partial_range(monkeypatch):
+    # Third scan only covers the first half of the reference energy grid.
+    energy = np.arange(10.)
+    data = {
+        0: (energy, np.full(10, 1.)),
+        1: (energy, np.full(10, 3.)),
+        2: (energy[:5], np.full(5, 8.)),
+    }
+
+    def fake_load_absorption(scan, *args, **kwargs):
+        return data[scan]
+
+    monkeypatch.setattr(absorption, 'load_absorption', fake_load_absorption)
+    energy_out, xanes, xanes_std = absorption.load_multi_xas(
+        [0, 1, 2], 'csv', max_workers=1
+        )
+
+    assert allclose(energy_out, energy)
+    assert allclose(xanes[:5], 4.)
+    assert allclose(xanes[5:], 2.)
+    assert allclose(xanes_std[:5], np.std([1., 3., 8.])/np.sqrt(3))
+    assert allclose(xanes_std[5:], np.std([1., 3.])/np.sqrt(2))
+
+    _, xanes_stream, xanes_std_stream = absorption.load_multi_xas_stream(
+        [0, 1, 2], 'csv'
+        )
+    assert allclose(xanes_stream, xanes)
+    assert allclose(xanes_std_stream, xanes_std)
+
+
+def test_load_multi_threads():
+    path = join('polartools', 'tests', 'data_for_test', 'csv')
+    x, dc, ac = absorption.load_lockin(
+        1049, 'csv', positioner='KBIC_x', folder=path
+        )
+    x_multi, dc_multi, ac_multi, _, _ = absorption.load_multi_lockin(
+        [1049, 1049, 1049], 'csv', positioner='KBIC_x', max_workers=2,
+        folder=path
+        )
+    assert allclose(x_multi, x)
+    assert allclose(dc_multi, dc)
+    assert allclose(ac_multi, ac)
+
+
+def test_load_scans_order():
+    def load_func(scan, source, delay):
+        # Earlier scans take longer, so they finish out of order.
+        sleep(delay*(5-scan))
+        return scan
+
+    scans = [0, 1, 2, 3, 4]
+    assert absorption._load_scans(
+        load_func, scans, 'csv', 0.02, max_workers=5
+        ) == scans
+
+
+def test_load_multi_xas_stream():
+    path = join('polartools', 'tests', 'data_for_test')
+    scans = [28, 29, 30, 31, 32]
+    energy, xas, xas_std = absorption.load_multi_xas(
+        scans, 'absorption.dat', detector='IC4', monitor='IC3', folder=path)
+    energy_stream, xas_stream, xas_std_stream = (
+        absorption.load_multi_xas_stream(
+            iter(scans), 'absorption.dat', detector='IC4', monitor='IC3',
+            folder=path
+            )
+        )
+    assert allclose(energy_stream, energy)
+    assert allclose(xas_stream, xas)
+    assert allclose(xas_std_stream, xas_std)
+
+
+def test_load_multi_pchip():
+    energy = np.linspace(0, 10, 41)
+    energy_scan = np.linspace(1.3, 8.7, 23)
+    y1, y2 = np.sin(energy_scan), energy_scan**2
+
+    inside = (energy >= 1.3) & (energy <= 8.7)
+    output = absorption._interp_scan(
+        energy, energy_scan, [y1, y2], kind='pchip'
+        )
+    assert allclose(
+        output[0][inside], PchipInterpolator(energy_scan, y1)(energy[inside])
+        )
+    assert allclose(
+        output[1][inside], PchipInterpolator(energy_scan, y2)(energy[inside])
+        )
+    assert np.isnan(output[:, ~inside]).all()
+
+    # Pchip is not linear, so it differs from the linear interpolation.
+    linear = absorption._interp_scan(energy, energy_scan, [y1])
+    assert not allclose(output[0][inside], linear[0][inside])
+
+    # Decreasing grid with a repeated energy: the repeated points are averaged.
+    energy_rep = np.array([6., 4., 2.5, 2.5, 1., 0.])
+    y_rep = np.array([3., 6., 5., 2., 1., 0.])
+    output = absorption._interp_scan(energy, energy_rep, [y_rep], kind='pchip')
+    expected = PchipInterpolator(
+        [0., 1., 2.5, 4., 6.], [0., 1., 3.5, 6., 3.], extrapolate=False
+        )(energy)
+    assert allclose(output[0], expected, equal_nan=True)
+
+    path = join('polartools', 'tests', 'data_for_test')
+    with raises(ValueError):
+        absorption.load_multi_dichro(
+            [39, 40, 41], 'absorption.dat', folder=path, kind='cubic')
+
+
+def test_default_names_not_cached_when_missing(tmp_path):
+    folder = str(tmp_path)
+    defaults = absorption._select_default_names('new_file.dat', folder=folder)
+    assert defaults is absorption._bluesky_default_cols
+
+    # File shows up later, e.g. SPEC just created it.
+    source = join('polartools', 'tests', 'data_for_test', 'absorption.dat')
+    copyfile(source, join(folder, 'new_file.dat'))
+    defaults = absorption._select_default_names('new_file.dat', folder=folder)
+    assert defaults is absorption._spec_default_cols
+
+
+def test_load_dichro_bluesky(monkeypatch):
+    rng = np.random.default_rng(0)
+    x0 = np.repeat(np.linspace(7.2, 7.3, 15), 4) + rng.normal(0, 1e-5, 60)
+    y0 = rng.normal(size=60)
+
+    def fake_load_absorption(*args, **kwargs):
+        return x0, y0
+
+    monkeypatch.setattr(absorption, 'load_absorption', fake_load_absorption)
+    # Databroker-like source -> Bluesky branch.
+    x, xanes, xmcd = absorption.load_dichro(1, object())
+
+    y = y0.reshape(15, 4)
+    assert allclose(x, x0.reshape(15, 4).mean(axis=1))
+    assert allclose(xanes, y.mean(axis=1))
+    assert allclose(xmcd, y[:, [0, 3]].mean(axis=1) - y[:, [1, 2]].mean(axis=1))
+    assert xanes.flags['C_CONTIGUOUS'] and xmcd.flags['C_CONTIGUOUS']
+    assert not np.shares_memory(xanes, xmcd)
+
+
+def test_interp_scan_linear():
+    energy = np.linspace(0, 10, 41)
+    energy_scan = np.linspace(1.3, 8.7, 23)
+    y1, y2 = np.sin(energy_scan), np.cos(energy_scan)
+
+    def reference(e, y):
+        return np.interp(energy, e, y, left=np.nan, right=np.nan)
+
+    # Shifted grid that covers only part of the reference energy.
+    output = absorption._interp_scan(energy, energy_scan, [y1, y2])
+    assert allclose(output[0], reference(energy_scan, y1), equal_nan=True)
+    assert allclose(output[1], reference(energy_scan, y2), equal_nan=True)
+    assert np.isnan(output[:, energy < 1.3]).all()
+    assert np.isnan(output[:, energy > 8.7]).all()
+    assert not np.isnan(output[:, (energy >= 1.3) & (energy <= 8.7)]).any()
+
+    # Decreasing grid.
+    output = absorption._interp_scan(energy, energy_scan[::-1], [y1[::-1]])
+    assert allclose(output[0], reference(energy_scan, y1), equal_nan=True)
+
+    # Repeated energy, including a reference point that falls on it.
+    energy_rep = np.array([0., 1., 2.5, 2.5, 4., 6.])
+    y_rep = np.array([0., 1., 2., 5., 6., 3.])
+    output = absorption._interp_scan(energy, energy_rep, [y_rep])
+    assert allclose(output[0], reference(energy_rep, y_rep), equal_nan=True)
+
+    # NaN/inf samples must not leak into the neighbouring points.
+    energy_bad = np.arange(5.)
+    for bad in (np.nan, np.inf):
+        y_bad = np.array([0., 1., bad, 3., 4.])
+        output = absorption._interp_scan(
+            energy_bad.copy(), energy_bad, [y_bad]
+            )
+        assert allclose(output[0], y_bad, equal_nan=True)
+
+
+def test_load_multi_bad_sample(monkeypatch):
+    energy = np.arange(5.)
+    data = {
+        1: (energy, np.full(5, 1.)),
+        2: (energy.copy(), np.full(5, 2.)),
+        3: (energy.copy(), np.array([3., 3., np.inf, 3., 3.])),
+    }
+
+    def fake_load_absorption(scan, *args, **kwargs):
+        return data[scan]
+
+    monkeypatch.setattr(absorption, 'load_absorption', fake_load_absorption)
+    _, xanes, _ = absorption.load_multi_xas([1, 2, 3], 'csv', max_workers=1)
+    assert allclose(xanes[[0, 1, 3, 4]], 2.)
+    assert np.isinf(xanes[2])
+
+
+def test_load_dichro_bluesky_size(monkeypatch):
+    def fake_load_absorption(*args, **kwargs):
+        return np.arange(10.), np.ones(10)
+
+    monkeypatch.setattr(absorption, 'load_absorption', fake_load_absorption)
+    with raises(ValueError, match='4 points per energy'):
+        absorption.load_dichro(1, object())
+
+
+def test_load_multi_empty():
+    path = join('polartools', 'tests', 'data_for_test')
+    with raises(ValueError, match='At least one scan'):
+        absorption.load_multi_xas([], 'absorption.dat', folder=path)
+    with raises(ValueError, match='At least one scan'):
+        absorption.load_multi_xas_stream([], 'absorption.dat', folder=path)